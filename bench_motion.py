@@ -0,0 +1,95 @@
+"""Replay accelerometer samples through the motion pipeline without an MPU6050.
+
+Usage:
+    python bench_motion.py [samples.csv]
+
+samples.csv is a recording made by chef.txt with MOTION_RECORD_PATH set.
+Without one, a synthetic 100 Hz trace of noisy tilt gestures is replayed.
+"""
+import random
+import sys
+import time
+
+from motion import MotionPipeline, load_samples
+
+
+def synthetic_samples(seconds=600, rate_hz=100, seed=42):
+    rng = random.Random(seed)
+    tilts = [(2.5, 0.0), (-2.5, 0.0), (0.0, 2.5), (0.0, -2.5)]
+    samples = []
+    for second in range(seconds):
+        # Hold a tilt for the first half of every third second, rest otherwise.
+        tilt_x, tilt_y = tilts[second % len(tilts)] if second % 3 == 0 else (0.0, 0.0)
+        for tick in range(rate_hz):
+            held = tick < rate_hz // 2
+            samples.append((
+                (tilt_x if held else 0.0) + rng.gauss(0, 0.4),
+                (tilt_y if held else 0.0) + rng.gauss(0, 0.4)
+            ))
+    return samples
+
+
+def legacy_read_motion(samples, window=5, threshold=1.5):
+    """The previous list-based smoothing: pop(0) plus sum() on every sample.
+
+    Like the old read_motion(), every sample that lands over the threshold
+    counts as a publish.
+    """
+    accel_x_values = []
+    accel_y_values = []
+    detections = 0
+    for accel_x, accel_y in samples:
+        accel_x_values.append(accel_x)
+        accel_y_values.append(accel_y)
+        if len(accel_x_values) > window:
+            accel_x_values.pop(0)
+            accel_y_values.pop(0)
+        avg_x = sum(accel_x_values) / len(accel_x_values)
+        avg_y = sum(accel_y_values) / len(accel_y_values)
+        if abs(avg_x) > threshold or abs(avg_y) > threshold:
+            detections += 1
+    return detections
+
+
+def replay_pipeline(samples, **kwargs):
+    pipeline = MotionPipeline(lambda: (0.0, 0.0), **kwargs)
+    gestures = 0
+    for accel_x, accel_y in samples:
+        if pipeline.process(accel_x, accel_y) is not None:
+            gestures += 1
+    return gestures
+
+
+def downsample(samples, rate_hz=100, tick_hz=2):
+    """Keep one sample per tick of the old 0.5 s sensor loop."""
+    return samples[::rate_hz // tick_hz]
+
+
+def bench(name, func, samples):
+    start = time.perf_counter()
+    result = func(samples)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {len(samples) / elapsed:>12,.0f} samples/s "
+          f"{elapsed / len(samples) * 1e6:>8.3f} us/sample {result:>8} publishes")
+
+
+def main():
+    if len(sys.argv) > 1:
+        samples = load_samples(sys.argv[1])
+        print(f"Replaying {len(samples)} recorded samples from {sys.argv[1]}")
+    else:
+        samples = synthetic_samples()
+        print(f"Replaying {len(samples)} synthetic samples")
+
+    # Like-for-like with the old device loop: 2 Hz sampling, 5-sample window.
+    bench("legacy loop at 2 Hz", legacy_read_motion, downsample(samples))
+    # Smoothing cost only: the old list code fed the full 100 Hz stream.
+    bench("legacy smoothing 100 Hz", legacy_read_motion, samples)
+    bench("legacy smoothing w=50", lambda s: legacy_read_motion(s, window=50), samples)
+    bench("ring window=5", lambda s: replay_pipeline(s, window=5), samples)
+    bench("ring window=50", lambda s: replay_pipeline(s, window=50), samples)
+    bench("ema alpha=0.2", lambda s: replay_pipeline(s, ema_alpha=0.2), samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-from fastapi import FastAPI, WebSocket, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional, Set
 import sqlite3
 import logging
 from contextlib import asynccontextmanager
@@ -12,9 +12,9 @@ import json
 import ssl
 import certifi
 import os
+import time
 
 logging.basicConfig(level=logging.INFO)
-websocket_connections: List[WebSocket] = []
 
 
 @asynccontextmanager
@@ -22,8 +22,14 @@ async def lifespan(app: FastAPI):
     logging.info("Starting application...")
     setup_database()
     insert_sample_recipes()
+    reaper = asyncio.create_task(reap_stale_connections())
     yield
     logging.info("Shutting down application...")
+    reaper.cancel()
+    try:
+        await reaper
+    except asyncio.CancelledError:
+        pass
 
 
 app = FastAPI(
@@ -64,12 +70,12 @@ def on_message(client, userdata, msg):
                 uuid = payload
                 event = action
 
-            message = json.dumps({"uuid": uuid, "event": event})
+            message = json.dumps({"uuid": uuid, "event": event}, separators=(",", ":"))
 
         elif msg.topic == "sensor/data/rfid":
             if "::" in payload:
                 uuid, ingredient = payload.split("::", 1)
-                message = json.dumps({"uuid": uuid, "ingredient": ingredient})
+                message = json.dumps({"uuid": uuid, "ingredient": ingredient}, separators=(",", ":"))
             else:
                 print(f"Invalid RFID message: {payload}")
                 return
@@ -77,14 +83,8 @@ def on_message(client, userdata, msg):
             return
 
         async def send_to_all():
-            for conn in active_connections:
-                try:
-                    await conn.send_text(message)
-                    print("WebSocket sent:", message)
-                except Exception as e:
-                    print("WebSocket error:", e)
-                    if conn in active_connections:
-                        active_connections.remove(conn)
+            await broadcast_message(message)
+            print("WebSocket sent:", message)
 
         asyncio.run_coroutine_threadsafe(send_to_all(), event_loop)
 
@@ -152,6 +152,13 @@ def setup_database():
         )
     """)
 
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_occasion_duration ON recipes (occasion, duration)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_duration ON recipes (duration)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_title ON recipes (title)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe ON recipe_ingredients (recipe_id, ingredient)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient ON recipe_ingredients (ingredient, recipe_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipe_steps_recipe ON recipe_steps (recipe_id, step_number)")
+
     conn.commit()
     conn.close()
     logging.info("Database setup complete.")
@@ -559,19 +566,169 @@ async def root():
     return {"message": "pong"}
 
 
-active_connections: List[WebSocket] = []
+# Registry of connected /ws clients. Each entry holds the client's pending
+# batch queue (None for legacy clients) and when it was last heard from.
+active_connections: Dict[WebSocket, dict] = {}
+
+# Clients opting into the batch subprotocol receive every event produced
+# within one flush window as a single JSON array frame.
+WS_BATCH_PROTOCOL = "cookbook.batch.v1"
+WS_FLUSH_INTERVAL = float(os.getenv("WS_FLUSH_INTERVAL", "0.05"))
+
+# The server negotiates permessage-deflate during the handshake whenever it
+# is enabled and the client offers it; the app only sees the client's offer.
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "1") != "0"
+
+# Every client gets protocol-level pings from uvicorn (ws_ping_interval and
+# ws_ping_timeout), which closes sockets that stop answering. Batch clients
+# additionally get an in-band [{"type": "ping"}] frame each interval and are
+# reaped by the app once silent (pong or otherwise) for the idle timeout.
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "15"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "45"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "2"))
+# Close codes reported when the keepalive gives up on a peer: 1011 from the
+# server's "keepalive ping timeout", 1006 when the socket died without a
+# closing handshake.
+WS_DEAD_PEER_CODES = {1006, 1011}
+HEARTBEAT_FRAME = json.dumps([{"type": "ping"}], separators=(",", ":"))
+
+background_tasks: Set[asyncio.Task] = set()
+
+ws_metrics = {
+    "legacy": {"frames": 0, "events": 0, "bytes": 0},
+    "batch": {"frames": 0, "events": 0, "bytes": 0}
+}
+
+connection_stats = {"accepted": 0, "dropped": 0, "reaped": 0}
+
+
+def deflate_negotiated(connection: WebSocket):
+    offered = connection.headers.get("sec-websocket-extensions", "")
+    return WS_PER_MESSAGE_DEFLATE and "permessage-deflate" in offered
+
+
+def register_connection(connection: WebSocket, batched: bool):
+    active_connections[connection] = {
+        "queue": [] if batched else None,
+        "deflate": deflate_negotiated(connection),
+        "last_seen": time.monotonic()
+    }
+    connection_stats["accepted"] += 1
+
+
+def drop_connection(connection: WebSocket):
+    """Forget a WebSocket client and any events still queued for it."""
+    if active_connections.pop(connection, None) is not None:
+        connection_stats["dropped"] += 1
+
+
+def spawn(coroutine):
+    task = asyncio.create_task(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+async def close_quietly(connection: WebSocket):
+    try:
+        await asyncio.wait_for(connection.close(code=1001), WS_SEND_TIMEOUT)
+    except Exception:
+        pass
+
+
+def reap_connection(connection: WebSocket, close: bool = True):
+    """Remove a stale client now; closing its socket happens in the background."""
+    if active_connections.pop(connection, None) is None:
+        return
+    connection_stats["reaped"] += 1
+    if close:
+        spawn(close_quietly(connection))
+
+
+async def guarded_send(connection: WebSocket, sending):
+    """Await a send to one client, reaping it if it blocks past WS_SEND_TIMEOUT."""
+    try:
+        await asyncio.wait_for(sending, WS_SEND_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("WebSocket send timed out")
+        reap_connection(connection)
+    except Exception as e:
+        print("WebSocket error:", e)
+        drop_connection(connection)
+
+
+async def ping_connection(connection: WebSocket):
+    try:
+        await asyncio.wait_for(connection.send_text(HEARTBEAT_FRAME), WS_SEND_TIMEOUT)
+    except Exception as e:
+        print("WebSocket heartbeat failed:", e)
+        reap_connection(connection)
+
+
+async def sweep_connections():
+    """Reap batch clients idle past the timeout and ping the rest concurrently."""
+    now = time.monotonic()
+    pings = []
+    for connection, entry in list(active_connections.items()):
+        if entry["queue"] is None:
+            continue
+        if now - entry["last_seen"] > WS_IDLE_TIMEOUT:
+            logging.info("Reaping idle WebSocket connection")
+            reap_connection(connection)
+        else:
+            pings.append(ping_connection(connection))
+    await asyncio.gather(*pings)
+
+
+async def reap_stale_connections():
+    """Background task: run a heartbeat sweep every interval."""
+    while True:
+        await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+        await sweep_connections()
+
+
+async def send_frame(connection: WebSocket, text: str, events: int, mode: str):
+    await connection.send_text(text)
+    stats = ws_metrics[mode]
+    stats["frames"] += 1
+    stats["events"] += events
+    stats["bytes"] += len(text.encode())
+
+
+async def flush_batch(connection: WebSocket):
+    """Wait for the flush window to close, then send queued events as one frame."""
+    await asyncio.sleep(WS_FLUSH_INTERVAL)
+    entry = active_connections.get(connection)
+    if entry is None or not entry["queue"]:
+        return
+    pending = entry["queue"]
+    entry["queue"] = []
+    await guarded_send(connection, send_frame(connection, "[" + ",".join(pending) + "]", len(pending), "batch"))
+
+
+async def send_event(connection: WebSocket, message: str):
+    """Send a JSON-encoded event now, or queue it for the next batch frame."""
+    entry = active_connections.get(connection)
+    pending = entry["queue"] if entry is not None else None
+    if pending is None:
+        await send_frame(connection, message, 1, "legacy")
+        return
+
+    pending.append(message)
+    if len(pending) == 1:
+        spawn(flush_batch(connection))
 
 
 async def broadcast_led_state():
     """Send LED state update to all connected clients."""
-    for connection in active_connections:
-        await connection.send_json(led_state)
+    await broadcast_message(json.dumps(led_state, separators=(",", ":")))
 
 
 async def broadcast_message(message: str):
     """Send MQTT-triggered navigation events to all connected WebSocket clients."""
-    for connection in active_connections:
-        await connection.send_text(message)
+    await asyncio.gather(*(
+        guarded_send(connection, send_event(connection, message))
+        for connection in list(active_connections)
+    ))
 
 
 @app.post("/led/set-color")
@@ -599,27 +756,62 @@ navigation_state = {}
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    active_connections.append(websocket)
+    batched = WS_BATCH_PROTOCOL in websocket.scope.get("subprotocols", [])
+    if batched:
+        await websocket.accept(subprotocol=WS_BATCH_PROTOCOL)
+    else:
+        await websocket.accept()
+    register_connection(websocket, batched)
     try:
         while True:
             message = await websocket.receive_text()
+            entry = active_connections.get(websocket)
+            if entry is None:
+                break
+            entry["last_seen"] = time.monotonic()
+
             data = json.loads(message)
+            if isinstance(data, dict) and data.get("type") == "pong":
+                continue
 
             if "uuid" in data and "event" in data:
                 navigation_state[data["uuid"]] = data["event"]
-                for conn in active_connections:
-                    await conn.send_json(data)
-    except:
-        active_connections.remove(websocket)
-
-
-async def broadcast_ws(data):
-    for ws in websocket_connections:
-        try:
-            await ws.send_text(json.dumps(data))
-        except:
-            pass
+                await broadcast_message(json.dumps(data, separators=(",", ":")))
+    except WebSocketDisconnect as e:
+        if e.code in WS_DEAD_PEER_CODES:
+            reap_connection(websocket, close=False)
+        else:
+            drop_connection(websocket)
+    except Exception as e:
+        print("WebSocket error:", e)
+        drop_connection(websocket)
+
+
+@app.get("/ws/metrics")
+def get_ws_metrics():
+    """API endpoint to report frames and bytes sent per event for each /ws mode.
+
+    Byte counts are payload sizes before permessage-deflate; deflate_connections
+    counts the clients whose frames the server is compressing on top of that.
+    """
+    response = {
+        "connections": len(active_connections),
+        "batch_connections": sum(1 for entry in active_connections.values() if entry["queue"] is not None),
+        "deflate_connections": sum(1 for entry in active_connections.values() if entry["deflate"]),
+        "per_message_deflate": WS_PER_MESSAGE_DEFLATE,
+        "flush_interval": WS_FLUSH_INTERVAL,
+        "heartbeat_interval": WS_HEARTBEAT_INTERVAL,
+        "idle_timeout": WS_IDLE_TIMEOUT,
+        **connection_stats
+    }
+    for mode, stats in ws_metrics.items():
+        events = stats["events"]
+        response[mode] = {
+            **stats,
+            "frames_per_event": stats["frames"] / events if events else 0.0,
+            "bytes_per_event": stats["bytes"] / events if events else 0.0
+        }
+    return response
 
 
 @app.get("/recipes", include_in_schema=False)
@@ -682,10 +874,111 @@ def get_recipe(recipe_id: int):
 
 
 class RecipeFilterRequest(BaseModel):
-    occasion: str
+    occasion: Optional[str] = None
+    occasions: List[str] = []
     include: List[str] = []
     exclude: List[str] = []
     match_all: bool = False
+    min_duration: Optional[int] = Field(None, ge=0)
+    max_duration: Optional[int] = Field(None, ge=0)
+    min_ingredients: Optional[int] = Field(None, ge=0)
+    max_ingredients: Optional[int] = Field(None, ge=0)
+    sort_by: Optional[Literal["duration", "title"]] = None
+    descending: bool = False
+    limit: Optional[int] = Field(None, ge=1)
+    offset: int = Field(0, ge=0)
+
+
+RECIPE_SORT_COLUMNS = {
+    "duration": "r.duration",
+    "title": "r.title"
+}
+
+
+def placeholders(values):
+    return ", ".join("?" for _ in values)
+
+
+def build_recipe_filter_query(request: RecipeFilterRequest):
+    """Compile a filter request into a single parameterised SQL query."""
+    clauses = []
+    params = []
+
+    occasions = list(request.occasions)
+    if request.occasion is not None:
+        occasions.append(request.occasion)
+    if occasions:
+        clauses.append(f"r.occasion IN ({placeholders(occasions)})")
+        params.extend(occasions)
+
+    if request.min_duration is not None:
+        clauses.append("r.duration >= ?")
+        params.append(request.min_duration)
+    if request.max_duration is not None:
+        clauses.append("r.duration <= ?")
+        params.append(request.max_duration)
+
+    # Ingredient criteria select recipe ids through the (ingredient, recipe_id)
+    # index instead of probing every recipe row with a correlated subquery.
+    if request.include:
+        include = sorted(set(request.include))
+        subquery = (
+            "SELECT recipe_id FROM recipe_ingredients "
+            f"WHERE ingredient IN ({placeholders(include)}) GROUP BY recipe_id"
+        )
+        params.extend(include)
+        if request.match_all:
+            subquery += " HAVING COUNT(DISTINCT ingredient) = ?"
+            params.append(len(include))
+        clauses.append(f"r.id IN ({subquery})")
+
+    if request.exclude:
+        clauses.append(
+            "r.id NOT IN (SELECT recipe_id FROM recipe_ingredients "
+            f"WHERE ingredient IN ({placeholders(request.exclude)}) AND recipe_id IS NOT NULL)"
+        )
+        params.extend(request.exclude)
+
+    count_query = "SELECT recipe_id FROM recipe_ingredients WHERE recipe_id IS NOT NULL GROUP BY recipe_id"
+    if request.min_ingredients:
+        having = "COUNT(*) >= ?"
+        params.append(request.min_ingredients)
+        if request.max_ingredients is not None:
+            having += " AND COUNT(*) <= ?"
+            params.append(request.max_ingredients)
+        clauses.append(f"r.id IN ({count_query} HAVING {having})")
+    elif request.max_ingredients is not None:
+        # Recipes with no ingredients at all satisfy a bare upper bound too.
+        clauses.append(f"r.id NOT IN ({count_query} HAVING COUNT(*) > ?)")
+        params.append(request.max_ingredients)
+
+    query = "SELECT r.id, r.title, r.description, r.occasion, r.duration FROM recipes r"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+
+    # Criteria that can drive an index search; exclusions and a bare upper
+    # ingredient bound have to visit every recipe anyway.
+    indexed = bool(
+        occasions or request.include or request.min_ingredients
+        or request.min_duration is not None or request.max_duration is not None
+    )
+
+    direction = "DESC" if request.descending else "ASC"
+    if request.sort_by is not None:
+        query += f" ORDER BY {RECIPE_SORT_COLUMNS[request.sort_by]} {direction}, r.id {direction}"
+    elif indexed:
+        # Unary + stops the planner from scanning in rowid order just to skip
+        # the sort, so the filter criteria get to pick the index.
+        query += f" ORDER BY +r.id {direction}"
+    else:
+        query += f" ORDER BY r.id {direction}"
+
+    if request.limit is not None or request.offset:
+        query += " LIMIT ? OFFSET ?"
+        params.append(request.limit if request.limit is not None else -1)
+        params.append(request.offset)
+
+    return query, params
 
 
 @app.post("/recipes/filter")
@@ -693,36 +986,31 @@ def filter_recipes(request: RecipeFilterRequest):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT * FROM recipes WHERE occasion = ?", (request.occasion,))
-    all_recipes = cursor.fetchall()
+    query, params = build_recipe_filter_query(request)
+    cursor.execute(query, params)
 
-    filtered_recipes = []
-    for recipe in all_recipes:
-        cursor.execute("SELECT ingredient FROM recipe_ingredients WHERE recipe_id = ?", (recipe["id"],))
-        ingredients = {row["ingredient"] for row in cursor.fetchall()}
-
-        if request.include:
-            if request.match_all:
-                if not all(inc in ingredients for inc in request.include):
-                    continue
-            else:
-                if not any(inc in ingredients for inc in request.include):
-                    continue
-
-        if request.exclude:
-            if any(exc in ingredients for exc in request.exclude):
-                continue
-
-        filtered_recipes.append({
+    filtered_recipes = [
+        {
             "id": recipe["id"],
             "title": recipe["title"],
             "description": recipe["description"],
+            "occasion": recipe["occasion"],
             "duration": recipe["duration"]
-        })
+        }
+        for recipe in cursor.fetchall()
+    ]
 
     conn.close()
     return filtered_recipes
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True,
+        ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE,
+        ws_ping_interval=WS_HEARTBEAT_INTERVAL,
+        ws_ping_timeout=WS_IDLE_TIMEOUT
+    )
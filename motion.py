@@ -0,0 +1,169 @@
+import csv
+import queue
+import threading
+import time
+
+# While reads keep failing, the sample interval doubles up to this many
+# seconds, and failures are logged at most once per ERROR_LOG_INTERVAL.
+ERROR_BACKOFF_MAX = 1.0
+ERROR_LOG_INTERVAL = 1.0
+
+
+class RingAverage:
+    """Moving average over a fixed-size ring buffer with a running sum."""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [0.0] * size
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        if self.count == self.size:
+            self.total -= self.values[self.index]
+        else:
+            self.count += 1
+        self.values[self.index] = value
+        self.total += value
+        self.index += 1
+        if self.index == self.size:
+            self.index = 0
+            # Resync once per lap so floating point error cannot accumulate.
+            self.total = sum(self.values)
+        return self.total / self.count
+
+
+class EmaAverage:
+    """Exponential moving average; alpha is the weight of the newest sample."""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = None
+
+    def add(self, value):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class GestureClassifier:
+    """Turn smoothed tilt into gestures, with hysteresis between enter and release."""
+
+    def __init__(self, enter_threshold=1.5, release_threshold=0.75):
+        self.enter_threshold = enter_threshold
+        self.release_threshold = release_threshold
+        self.state = None
+
+    def classify(self, avg_x, avg_y):
+        """Return a gesture when one starts, otherwise None."""
+        if self.state is not None:
+            tilt = {
+                "FORWARD": avg_x,
+                "BACKWARD": -avg_x,
+                "LEFT": avg_y,
+                "RIGHT": -avg_y
+            }[self.state]
+            if tilt > self.release_threshold:
+                return None
+            self.state = None
+
+        if avg_x > self.enter_threshold:
+            self.state = "FORWARD"
+        elif avg_x < -self.enter_threshold:
+            self.state = "BACKWARD"
+        elif avg_y > self.enter_threshold:
+            self.state = "LEFT"
+        elif avg_y < -self.enter_threshold:
+            self.state = "RIGHT"
+        return self.state
+
+
+class MotionPipeline:
+    """Sample the accelerometer on its own thread and queue detected gestures.
+
+    read_sample is any callable returning an (x, y) tuple, so the pipeline
+    can run against the MPU6050 or against recorded samples.
+    """
+
+    def __init__(self, read_sample, rate_hz=100, window=10, ema_alpha=None,
+                 enter_threshold=1.5, release_threshold=0.75, recorder=None):
+        self.read_sample = read_sample
+        self.interval = 1.0 / rate_hz
+        if ema_alpha is None:
+            self.smooth_x = RingAverage(window)
+            self.smooth_y = RingAverage(window)
+        else:
+            self.smooth_x = EmaAverage(ema_alpha)
+            self.smooth_y = EmaAverage(ema_alpha)
+        self.classifier = GestureClassifier(enter_threshold, release_threshold)
+        self.recorder = recorder
+        self.gestures = queue.Queue()
+        self.samples = 0
+        self.overruns = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self._error_logged_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def process(self, accel_x, accel_y):
+        """Feed one raw sample; return the gesture it starts, if any."""
+        self.samples += 1
+        avg_x = self.smooth_x.add(accel_x)
+        avg_y = self.smooth_y.add(accel_y)
+        return self.classifier.classify(avg_x, avg_y)
+
+    def run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                accel_x, accel_y = self.read_sample()
+            except Exception as e:
+                # A transient I2C error must not silently end motion detection.
+                self.errors += 1
+                self.consecutive_errors += 1
+                now = time.monotonic()
+                if self._error_logged_at is None or now - self._error_logged_at >= ERROR_LOG_INTERVAL:
+                    print(f"Motion sample failed ({self.errors} errors so far): {e}")
+                    self._error_logged_at = now
+            else:
+                self.consecutive_errors = 0
+                if self.recorder is not None:
+                    self.recorder.writerow([time.monotonic(), accel_x, accel_y])
+                gesture = self.process(accel_x, accel_y)
+                if gesture is not None:
+                    self.gestures.put(gesture)
+
+            # Schedule against absolute deadlines so the rate does not drift.
+            interval = self.interval
+            if self.consecutive_errors:
+                interval = min(interval * 2 ** min(self.consecutive_errors, 16), ERROR_BACKOFF_MAX)
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                self.overruns += 1
+                next_tick = time.monotonic()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="motion-sampler", daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def load_samples(path):
+    """Load recorded (x, y) samples from a CSV written by the sampler's recorder."""
+    with open(path, newline="") as f:
+        return [(float(row[-2]), float(row[-1])) for row in csv.reader(f) if row]
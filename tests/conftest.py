@@ -0,0 +1,10 @@
+import os
+import sys
+
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main.py connects to the MQTT broker at import time; keep tests offline.
+mqtt.Client.connect = lambda self, *args, **kwargs: mqtt.MQTT_ERR_SUCCESS
+mqtt.Client.loop_start = lambda self: mqtt.MQTT_ERR_SUCCESS
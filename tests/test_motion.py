@@ -0,0 +1,56 @@
+import time
+
+from motion import GestureClassifier, MotionPipeline, RingAverage
+
+
+def test_ring_average_matches_window_mean():
+    ring = RingAverage(3)
+    values = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+    for i, value in enumerate(values):
+        window = values[max(0, i - 2):i + 1]
+        assert ring.add(value) == sum(window) / len(window)
+
+
+def test_classifier_publishes_once_per_tilt():
+    classifier = GestureClassifier(enter_threshold=1.5, release_threshold=0.75)
+    readings = [0.0, 2.0, 2.0, 1.0, 2.0, 0.5, 2.0]
+    gestures = [classifier.classify(x, 0.0) for x in readings]
+    assert gestures == [None, "FORWARD", None, None, None, None, "FORWARD"]
+
+
+def test_sampler_survives_read_errors():
+    calls = []
+
+    def read_sample():
+        calls.append(None)
+        if len(calls) % 2:
+            raise OSError("I2C read failed")
+        return 2.0, 0.0
+
+    pipeline = MotionPipeline(read_sample, rate_hz=500, window=2)
+    pipeline.start()
+    deadline = time.monotonic() + 2
+    while pipeline.samples < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pipeline.alive
+    pipeline.stop()
+
+    assert pipeline.errors >= 10
+    assert pipeline.samples >= 10
+    assert pipeline.gestures.get_nowait() == "FORWARD"
+
+
+def test_persistent_read_errors_back_off_and_rate_limit_logging(capsys):
+    def read_sample():
+        raise OSError("MPU6050 not responding")
+
+    pipeline = MotionPipeline(read_sample, rate_hz=500)
+    pipeline.start()
+    time.sleep(0.5)
+    assert pipeline.alive
+    pipeline.stop()
+
+    # 250 reads at full rate; backoff leaves only a handful.
+    assert 1 <= pipeline.errors < 20
+    logged = capsys.readouterr().out.count("Motion sample failed")
+    assert logged == 1
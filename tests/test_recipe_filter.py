@@ -0,0 +1,90 @@
+import pytest
+
+import main
+from main import RecipeFilterRequest, build_recipe_filter_query
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    main.setup_database()
+    conn = main.get_db_connection()
+    occasions = ["Breakfast", "Lunch", "Dinner", "Dessert"]
+    ingredients = ["Eggs", "Milk", "Flour", "Sugar", "Butter", "Tomato", "Cheese", "Salt"]
+    for i in range(2000):
+        cursor = conn.execute(
+            "INSERT INTO recipes (title, description, occasion, duration) VALUES (?, ?, ?, ?)",
+            (f"Recipe {i}", "", occasions[i % 4], i % 120)
+        )
+        for j in range(1 + i % 5):
+            conn.execute(
+                "INSERT INTO recipe_ingredients (recipe_id, ingredient) VALUES (?, ?)",
+                (cursor.lastrowid, ingredients[(i + j) % len(ingredients)])
+            )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def query_plan(conn, request):
+    query, params = build_recipe_filter_query(request)
+    return [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+
+@pytest.mark.parametrize("criteria", [
+    {"occasions": ["Lunch", "Dinner"]},
+    {"occasion": "Dessert"},
+    {"min_duration": 10, "max_duration": 20},
+    {"max_duration": 5},
+    {"include": ["Eggs", "Milk"]},
+    {"include": ["Eggs", "Milk"], "match_all": True},
+    {"min_ingredients": 4},
+    {"min_ingredients": 2, "max_ingredients": 3},
+    {"include": ["Eggs"], "exclude": ["Milk"], "min_ingredients": 2, "max_ingredients": 4},
+    {"sort_by": "title"},
+    {"occasions": ["Lunch"], "sort_by": "duration", "descending": True, "limit": 5, "offset": 5},
+])
+def test_filter_query_uses_indexes(db, criteria):
+    plan = query_plan(db, RecipeFilterRequest(**criteria))
+    assert "SCAN r" not in plan, plan
+
+
+@pytest.mark.parametrize("criteria, index", [
+    ({"exclude": ["Milk", "Salt"]}, "idx_recipe_ingredients_ingredient"),
+    ({"max_ingredients": 2}, "idx_recipe_ingredients_recipe"),
+])
+def test_negative_criteria_probe_ingredient_index(db, criteria, index):
+    # A pure exclusion must visit every recipe, but the probe itself is indexed.
+    plan = query_plan(db, RecipeFilterRequest(**criteria))
+    assert any(index in step for step in plan), plan
+    # The full scan already yields rows in id order, so no extra sort.
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
+
+
+def test_filter_results_match_criteria(db):
+    request = RecipeFilterRequest(
+        occasions=["Breakfast", "Dessert"], include=["Eggs", "Milk"], match_all=True,
+        exclude=["Salt"], min_duration=10, max_duration=60,
+        min_ingredients=2, max_ingredients=4, sort_by="duration"
+    )
+    query, params = build_recipe_filter_query(request)
+    rows = db.execute(query, params).fetchall()
+    assert rows
+    durations = [row["duration"] for row in rows]
+    assert durations == sorted(durations)
+    for row in rows:
+        found = {r["ingredient"] for r in db.execute(
+            "SELECT ingredient FROM recipe_ingredients WHERE recipe_id = ?", (row["id"],))}
+        assert row["occasion"] in ("Breakfast", "Dessert")
+        assert 10 <= row["duration"] <= 60
+        assert {"Eggs", "Milk"} <= found and "Salt" not in found
+        assert 2 <= len(found) <= 4
+
+
+@pytest.mark.parametrize("field, value", [
+    ("limit", 0), ("limit", -1), ("offset", -1),
+    ("min_duration", -5), ("max_ingredients", -1),
+])
+def test_filter_rejects_negative_bounds(field, value):
+    with pytest.raises(ValueError):
+        RecipeFilterRequest(**{field: value})
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "WS_FLUSH_INTERVAL", 0.3)
+    main.active_connections.clear()
+    for stats in main.ws_metrics.values():
+        for key in stats:
+            stats[key] = 0
+    with TestClient(main.app) as client:
+        yield client
+    main.active_connections.clear()
+
+
+def test_batch_client_gets_one_array_frame_per_flush_window(client):
+    with client.websocket_connect("/ws", subprotocols=[main.WS_BATCH_PROTOCOL]) as batch, \
+            client.websocket_connect("/ws") as legacy:
+        assert batch.accepted_subprotocol == main.WS_BATCH_PROTOCOL
+        assert legacy.accepted_subprotocol is None
+
+        client.post("/led/set-color", json={"color": "ff0000", "power": "on"})
+        client.post("/led/set-color", json={"color": "00ff00", "power": "on"})
+
+        first = legacy.receive_text()
+        second = legacy.receive_text()
+        assert json.loads(first) == {"color": "ff0000", "power": "on"}
+        assert json.loads(second) == {"color": "00ff00", "power": "on"}
+
+        frame = batch.receive_text()
+        assert json.loads(frame) == [
+            {"color": "ff0000", "power": "on"},
+            {"color": "00ff00", "power": "on"}
+        ]
+
+        metrics = client.get("/ws/metrics").json()
+
+    assert metrics["connections"] == 2
+    assert metrics["batch_connections"] == 1
+    assert metrics["legacy"]["frames"] == 2
+    assert metrics["legacy"]["events"] == 2
+    assert metrics["legacy"]["frames_per_event"] == 1.0
+    assert metrics["legacy"]["bytes_per_event"] == (len(first) + len(second)) / 2
+    assert metrics["batch"]["frames"] == 1
+    assert metrics["batch"]["events"] == 2
+    assert metrics["batch"]["frames_per_event"] == 0.5
+    assert metrics["batch"]["bytes_per_event"] == len(frame) / 2
+    # Compact separators, as Starlette's send_json used.
+    assert first == '{"color":"ff0000","power":"on"}'
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+import main
+
+
+class FakeSocket:
+    def __init__(self, fail=False):
+        self.headers = {}
+        self.fail = fail
+        self.sent = []
+        self.closed = None
+
+    async def send_text(self, text):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+class HangingSocket(FakeSocket):
+    async def send_text(self, text):
+        await asyncio.sleep(3600)
+
+
+class DisconnectingSocket(FakeSocket):
+    """Accepts, then reports the given close code on the first receive."""
+
+    def __init__(self, code):
+        super().__init__()
+        self.scope = {"subprotocols": []}
+        self.code = code
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def receive_text(self):
+        raise WebSocketDisconnect(code=self.code)
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(main, "WS_SEND_TIMEOUT", 0.05)
+    main.active_connections.clear()
+    for key in main.connection_stats:
+        main.connection_stats[key] = 0
+    yield main.active_connections
+    main.active_connections.clear()
+
+
+async def settle():
+    await asyncio.gather(*main.background_tasks)
+
+
+def test_silent_batch_client_is_reaped():
+    async def scenario():
+        silent, healthy = FakeSocket(), FakeSocket()
+        main.register_connection(silent, batched=True)
+        main.register_connection(healthy, batched=True)
+        main.active_connections[silent]["last_seen"] -= main.WS_IDLE_TIMEOUT + 1
+
+        await main.sweep_connections()
+        await settle()
+
+        assert silent not in main.active_connections
+        assert silent.closed == 1001
+        assert healthy in main.active_connections
+        assert json.loads(healthy.sent[-1]) == [{"type": "ping"}]
+        assert main.connection_stats["reaped"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_silent_legacy_client_is_left_to_protocol_pings():
+    async def scenario():
+        listener = FakeSocket()
+        main.register_connection(listener, batched=False)
+        main.active_connections[listener]["last_seen"] -= main.WS_IDLE_TIMEOUT + 1
+
+        await main.sweep_connections()
+
+        assert listener in main.active_connections
+        assert listener.sent == []
+        assert main.connection_stats["reaped"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failing_and_hanging_clients_do_not_stall_the_sweep():
+    async def scenario():
+        failing, hanging, healthy = FakeSocket(fail=True), HangingSocket(), FakeSocket()
+        for connection in (failing, hanging, healthy):
+            main.register_connection(connection, batched=True)
+
+        start = time.monotonic()
+        await main.sweep_connections()
+        await settle()
+
+        assert time.monotonic() - start < 1
+        assert failing not in main.active_connections
+        assert hanging not in main.active_connections
+        assert healthy in main.active_connections
+        assert main.connection_stats["reaped"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_broadcast_drops_failing_client_only():
+    async def scenario():
+        failing, healthy = FakeSocket(fail=True), FakeSocket()
+        main.register_connection(failing, batched=False)
+        main.register_connection(healthy, batched=False)
+
+        await main.broadcast_message(json.dumps({"uuid": "rpi", "event": "up"}))
+
+        assert failing not in main.active_connections
+        assert healthy.sent == ['{"uuid": "rpi", "event": "up"}']
+        assert main.connection_stats["dropped"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_broadcast_reaps_hanging_client_without_delaying_others():
+    async def scenario():
+        hanging, healthy = HangingSocket(), FakeSocket()
+        main.register_connection(hanging, batched=False)
+        main.register_connection(healthy, batched=False)
+
+        start = time.monotonic()
+        await main.broadcast_message('{"uuid":"rpi","event":"up"}')
+
+        assert time.monotonic() - start < 1
+        assert healthy.sent == ['{"uuid":"rpi","event":"up"}']
+        assert hanging not in main.active_connections
+        assert healthy in main.active_connections
+        assert main.connection_stats["reaped"] == 1
+        await settle()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("code, reaped, dropped", [
+    (1011, 1, 0),
+    (1006, 1, 0),
+    (1000, 0, 1),
+])
+def test_keepalive_disconnect_counts_as_reaped(code, reaped, dropped):
+    async def scenario():
+        socket = DisconnectingSocket(code)
+        await main.websocket_endpoint(socket)
+
+        assert socket not in main.active_connections
+        assert main.connection_stats["reaped"] == reaped
+        assert main.connection_stats["dropped"] == dropped
+        assert socket.closed is None
+
+    asyncio.run(scenario())